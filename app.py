@@ -1,8 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+import csv
+import io
+import os
 import json
 import logging
+import tempfile
 from agent import evaluate
+import store
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
@@ -96,6 +101,13 @@ def audit_candidate():
         
         summary, result = evaluate(candidate, job_requirements)
         
+        # Persisting is best-effort: a store failure must not lose the audit result
+        audit_id, jd_hash = None, store.jd_hash(job_requirements)
+        try:
+            audit_id, jd_hash = store.save_audit(candidate, job_requirements, summary, result)
+        except Exception as e:
+            logger.error(f"Failed to persist audit result: {str(e)}")
+        
         response_data = {
             "success": True,
             "data": {
@@ -103,6 +115,8 @@ def audit_candidate():
                 "result": result
             },
             "metadata": {
+                "audit_id": audit_id,
+                "jd_hash": jd_hash,
                 "candidate_name": candidate.get('name', 'Unknown'),
                 "verdict": result.get('verdict', 'Unknown'),
                 "criteria_count": len(result.get('criteria', [])),
@@ -166,6 +180,178 @@ def match_major():
             "error": str(e)
         }), 500
 
+def _audit_filters():
+    filters = {
+        "jd_hash": request.args.get('jd_hash'),
+        "verdict": request.args.get('verdict'),
+        "criterion": request.args.get('criterion'),
+        "criterion_match": request.args.get('criterion_match'),
+        "since": request.args.get('since'),
+        "until": request.args.get('until')
+    }
+    if not filters['jd_hash'] and request.args.get('job_requirements'):
+        filters['jd_hash'] = store.jd_hash(request.args['job_requirements'])
+    
+    for key in ('since', 'until'):
+        if filters[key]:
+            try:
+                filters[key] = store.normalize_timestamp(filters[key])
+            except (ValueError, OverflowError):
+                raise ValueError(f"'{key}' must be an ISO 8601 date or datetime")
+    return filters
+
+
+@app.route('/audits', methods=['GET'])
+def list_audits():
+    """
+    审核记录查询接口
+    
+    查询参数:
+        jd_hash / job_requirements  按岗位要求过滤（二选一，后者会自动计算哈希）
+        verdict                     通过 | 未通过 | 待核验
+        criterion                   条目名称，如 专业
+        criterion_match             Yes | No | Unknown，单独使用时匹配任一条目
+        since / until               ISO 时间范围，如 2025-01-01 或 2025-01-01T00:00:00+08:00
+        limit                       每页条数，默认 50，最大 500
+        cursor                      上一页返回的 next_cursor
+        include_result              是否返回完整 result，默认 true
+    
+    示例：GET /audits?jd_hash=...&verdict=未通过&criterion=专业&criterion_match=No
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', 50))
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "'limit' and 'cursor' must be integers"
+            }), 400
+        
+        if limit < 1 or limit > 500:
+            return jsonify({
+                "success": False,
+                "error": "'limit' must be between 1 and 500"
+            }), 400
+        
+        try:
+            filters = _audit_filters()
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        include_result = request.args.get('include_result', 'true').lower() != 'false'
+        page = store.query_audits(filters, limit=limit, cursor=cursor,
+                                  include_result=include_result)
+        
+        return jsonify({
+            "success": True,
+            "data": page['items'],
+            "next_cursor": page['next_cursor']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error querying audits: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+def _stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the Chinese text as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(store.EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([store.escape_formula(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _stream_xlsx(rows):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    
+    # write_only mode flushes rows to disk instead of keeping the sheet in memory
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('audits')
+        ws.append(store.EXPORT_COLUMNS)
+        for row in rows:
+            try:
+                cells = []
+                for value in row:
+                    cell = WriteOnlyCell(ws, value=value)
+                    if isinstance(value, str):
+                        # Explicit string cell: text like "=1+1" is stored verbatim, never as a formula
+                        cell.data_type = 's'
+                    cells.append(cell)
+                ws.append(cells)
+            except Exception as e:
+                logger.warning(f"Skipping audit {row[0]} in XLSX export: {str(e)}")
+        wb.save(path)
+        
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+@app.route('/audits/export', methods=['GET'])
+def export_audits():
+    """
+    审核记录导出接口
+    
+    查询参数与 /audits 相同的过滤条件，另加:
+        format  csv | xlsx，默认 csv
+    
+    csv 边查询边输出，首字节立即返回；xlsx 需先在临时文件中生成完整工作簿
+    再开始传输（内存占用有限，但大批量导出前可能长时间无响应，
+    建议配合 since/until 等条件分批导出）。
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    try:
+        filters = _audit_filters()
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    rows = store.iter_export_rows(filters)
+    
+    if export_format == 'csv':
+        return Response(
+            _stream_csv(rows),
+            mimetype='text/csv; charset=utf-8',
+            headers={"Content-Disposition": "attachment; filename=audits.csv"}
+        )
+    
+    if export_format == 'xlsx':
+        return Response(
+            _stream_xlsx(rows),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={"Content-Disposition": "attachment; filename=audits.xlsx"}
+        )
+    
+    return jsonify({
+        "success": False,
+        "error": "'format' must be 'csv' or 'xlsx'"
+    }), 400
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -181,8 +367,6 @@ def method_not_allowed(error):
     }), 405
 
 if __name__ == '__main__':
-    import os
-    
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
@@ -190,5 +374,6 @@ if __name__ == '__main__':
     print(f"Health check: http://localhost:{port}/health")
     print(f"Audit endpoint: http://localhost:{port}/audit")
     print(f"Major matching: http://localhost:{port}/major/match")
+    print(f"Audit records: http://localhost:{port}/audits")
     
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from dateutil.parser import isoparse
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get('AUDIT_DB_PATH', 'audits.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    candidate_name TEXT,
+    jd_hash TEXT NOT NULL,
+    verdict TEXT,
+    summary TEXT,
+    missing_data TEXT NOT NULL,
+    policy_flags TEXT NOT NULL,
+    result_json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_criteria (
+    audit_id INTEGER NOT NULL REFERENCES audits(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    match TEXT,
+    job_requirement TEXT,
+    candidate_evidence TEXT,
+    rationale TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audits_jd_hash ON audits(jd_hash, id);
+CREATE INDEX IF NOT EXISTS idx_audits_jd_verdict ON audits(jd_hash, verdict, id);
+CREATE INDEX IF NOT EXISTS idx_audits_verdict ON audits(verdict, id);
+CREATE INDEX IF NOT EXISTS idx_criteria_name ON audit_criteria(name, match, audit_id);
+CREATE INDEX IF NOT EXISTS idx_criteria_audit ON audit_criteria(audit_id);
+"""
+
+EXPORT_COLUMNS = [
+    'id', 'created_at', 'candidate_name', 'jd_hash', 'verdict',
+    'criteria', 'missing_data', 'policy_flags', 'summary'
+]
+
+# Rows per export query; each batch is a short read so no WAL snapshot stays pinned
+EXPORT_BATCH_SIZE = 500
+
+# Cells starting with these are evaluated as formulas by Excel/WPS
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def jd_hash(jd_text: str) -> str:
+    # Whitespace-insensitive so the same JD pasted with different indentation groups together
+    normalized = re.sub(r'\s+', '', jd_text or '')
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _text(value: Any) -> Optional[str]:
+    # LLM output is loosely typed: lists/objects are stored as JSON, scalars as str
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _as_list(value: Any) -> List[Any]:
+    # missing_data / policy_flags should be lists, but a bare string or scalar is one entry
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _join(values: Any) -> str:
+    return '; '.join(_text(v) or '' for v in _as_list(values))
+
+
+def normalize_timestamp(value: str) -> str:
+    """
+    将 ISO 时间转换为与 created_at 相同的本地时间格式，非法输入抛出 ValueError
+
+    带时区的时间（如 Z、+08:00）先换算为服务器本地时间再比较。
+    """
+    parsed = isoparse(value.strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat(timespec='seconds')
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.execute('PRAGMA busy_timeout=30000')
+
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                conn.executescript(SCHEMA)
+                _schema_ready.add(path)
+    return conn
+
+
+def save_audit(candidate: Dict, jd_text: str, summary: str, result: Dict,
+               db_path: Optional[str] = None) -> Tuple[int, str]:
+    """保存一次审核结果，返回 (audit_id, jd_hash)"""
+    digest = jd_hash(jd_text)
+    criteria = result.get('criteria') or []
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            cur = conn.execute(
+                """INSERT INTO audits (created_at, candidate_name, jd_hash, verdict, summary,
+                                       missing_data, policy_flags, result_json)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    datetime.now().isoformat(timespec='seconds'),
+                    _text(candidate.get('name')),
+                    digest,
+                    _text(result.get('verdict')),
+                    _text(summary),
+                    json.dumps(_as_list(result.get('missing_data')), ensure_ascii=False),
+                    json.dumps(_as_list(result.get('policy_flags')), ensure_ascii=False),
+                    json.dumps(result, ensure_ascii=False),
+                )
+            )
+            audit_id = cur.lastrowid
+            conn.executemany(
+                """INSERT INTO audit_criteria (audit_id, name, match, job_requirement,
+                                               candidate_evidence, rationale)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        audit_id,
+                        _text(c.get('name')) or '',
+                        _text(c.get('match')),
+                        _text(c.get('job_requirement')),
+                        _text(c.get('candidate_evidence')),
+                        _text(c.get('rationale')),
+                    )
+                    for c in criteria if isinstance(c, dict)
+                ]
+            )
+    finally:
+        conn.close()
+
+    return audit_id, digest
+
+
+def _build_filters(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    clauses = []
+    params = []
+
+    if filters.get('jd_hash'):
+        clauses.append('a.jd_hash = ?')
+        params.append(filters['jd_hash'])
+    if filters.get('verdict'):
+        clauses.append('a.verdict = ?')
+        params.append(filters['verdict'])
+    if filters.get('criterion') or filters.get('criterion_match'):
+        # criterion_match alone matches audits where any criterion has that result
+        sub = 'SELECT 1 FROM audit_criteria c WHERE c.audit_id = a.id'
+        if filters.get('criterion'):
+            sub += ' AND c.name = ?'
+            params.append(filters['criterion'])
+        if filters.get('criterion_match'):
+            sub += ' AND c.match = ?'
+            params.append(filters['criterion_match'])
+        clauses.append(f'EXISTS ({sub})')
+    if filters.get('since'):
+        clauses.append('a.created_at >= ?')
+        params.append(filters['since'])
+    if filters.get('until'):
+        clauses.append('a.created_at < ?')
+        params.append(filters['until'])
+
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return where, params
+
+
+def _row_to_dict(row: sqlite3.Row, include_result: bool = True) -> Dict[str, Any]:
+    item = {
+        "id": row['id'],
+        "created_at": row['created_at'],
+        "candidate_name": row['candidate_name'],
+        "jd_hash": row['jd_hash'],
+        "verdict": row['verdict'],
+        "summary": row['summary'],
+        "missing_data": json.loads(row['missing_data']),
+        "policy_flags": json.loads(row['policy_flags']),
+    }
+    if include_result:
+        item['result'] = json.loads(row['result_json'])
+    return item
+
+
+def query_audits(filters: Dict[str, Any], limit: int = 50, cursor: Optional[int] = None,
+                 include_result: bool = True, db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    按条件分页查询审核记录（按 id 倒序）
+
+    使用 keyset 分页：返回的 next_cursor 作为下一页的 cursor 传入，
+    翻页开销与页码无关。
+    """
+    where, params = _build_filters(filters)
+    if cursor is not None:
+        where += (' AND ' if where else ' WHERE ') + 'a.id < ?'
+        params.append(cursor)
+
+    conn = connect(db_path)
+    try:
+        # Fetch one extra row to know whether another page exists
+        rows = conn.execute(
+            f'SELECT a.* FROM audits a{where} ORDER BY a.id DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [_row_to_dict(row, include_result) for row in rows],
+        "next_cursor": rows[-1]['id'] if has_more else None,
+    }
+
+
+def export_cell(value: Any) -> Any:
+    """清理导出单元格：去除 XLSX 不允许的控制字符"""
+    if not isinstance(value, str):
+        return value
+    return ILLEGAL_CHARACTERS_RE.sub('', value)
+
+
+def escape_formula(value: Any) -> Any:
+    """
+    CSV 专用：为可能被当作公式的文本加 ' 前缀
+
+    XLSX 以显式字符串单元格写入，不需要也不应改动原文。
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _export_row(row: sqlite3.Row) -> List[Any]:
+    result = json.loads(row['result_json'])
+    criteria = '; '.join(
+        f"{c.get('name') or ''}:{c.get('match') or ''}"
+        for c in result.get('criteria') or [] if isinstance(c, dict)
+    )
+    values = [
+        row['id'],
+        row['created_at'],
+        row['candidate_name'],
+        row['jd_hash'],
+        row['verdict'],
+        criteria,
+        _join(json.loads(row['missing_data'])),
+        _join(json.loads(row['policy_flags'])),
+        row['summary'],
+    ]
+    return [export_cell(v) for v in values]
+
+
+def iter_export_rows(filters: Dict[str, Any], db_path: Optional[str] = None,
+                     batch_size: Optional[int] = None) -> Iterator[List[Any]]:
+    """
+    逐行产出导出数据，按 id 倒序分批读取，不会一次性加载全部结果
+
+    每批都是一次独立的短查询（与 query_audits 相同的 keyset 游标），
+    批次之间不持有读事务，慢速下载不会阻止 WAL checkpoint。
+    每个单元格都经过 export_cell 清理；无法转换的记录记录日志后跳过。
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    cursor = None
+
+    while True:
+        where, params = _build_filters(filters)
+        if cursor is not None:
+            where += (' AND ' if where else ' WHERE ') + 'a.id < ?'
+            params.append(cursor)
+
+        conn = connect(db_path)
+        try:
+            rows = conn.execute(
+                f'SELECT a.* FROM audits a{where} ORDER BY a.id DESC LIMIT ?',
+                params + [batch_size]
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            try:
+                values = _export_row(row)
+            except Exception as e:
+                logger.warning(f"Skipping audit {row['id']} in export: {str(e)}")
+                continue
+            yield values
+
+        if len(rows) < batch_size:
+            break
+        cursor = rows[-1]['id']
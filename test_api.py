@@ -72,6 +72,35 @@ def test_major_matching():
         print(f"Error: {result.get('error')}")
     print()
 
+def test_list_audits():
+    """测试审核记录查询"""
+    print("=== 测试审核记录查询 ===")
+    
+    params = {
+        "verdict": "未通过",
+        "criterion": "专业",
+        "criterion_match": "No",
+        "limit": 10,
+        "include_result": "false"
+    }
+    
+    response = requests.get(f"{API_BASE}/audits", params=params)
+    print(f"Status: {response.status_code}")
+    result = response.json()
+    
+    if result.get('success'):
+        print(f"Records: {len(result['data'])}")
+        for item in result['data']:
+            print(f"  #{item['id']} {item['candidate_name']}: {item['verdict']}")
+        print(f"Next cursor: {result['next_cursor']}")
+    else:
+        print(f"Error: {result.get('error')}")
+    
+    response = requests.get(f"{API_BASE}/audits/export", params={"format": "csv", "verdict": "未通过"}, stream=True)
+    print(f"Export status: {response.status_code}")
+    print(f"Export header: {next(response.iter_lines()).decode('utf-8-sig')}")
+    print()
+
 def test_curl_examples():
     """生成curl命令示例"""
     print("=== CURL 命令示例 ===")
@@ -113,6 +142,7 @@ if __name__ == "__main__":
         test_health()
         test_single_audit()
         test_major_matching()    
+        test_list_audits()
         test_curl_examples()
         
     except requests.exceptions.ConnectionError:
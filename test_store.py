@@ -0,0 +1,283 @@
+import io
+import csv
+import sqlite3
+
+import pytest
+from openpyxl import load_workbook
+
+import app as app_module
+import store
+
+
+def make_result(verdict="未通过", major_match="No", **extra):
+    result = {
+        "verdict": verdict,
+        "criteria": [
+            {"name": "年龄", "match": "Yes", "rationale": "符合"},
+            {"name": "专业", "match": major_match, "rationale": "不在专业清单"}
+        ],
+        "missing_data": ["证书"],
+        "policy_flags": []
+    }
+    result.update(extra)
+    return result
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "audits.db")
+    monkeypatch.setattr(store, "DB_PATH", path)
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    return app_module.app.test_client()
+
+
+def test_save_audit_uses_wal_and_returns_ids(db_path):
+    audit_id, digest = store.save_audit({"name": "张三"}, "专业：计算机", "结论：未通过", make_result(), db_path=db_path)
+
+    assert audit_id == 1
+    assert digest == store.jd_hash("专业：计算机")
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("SELECT COUNT(*) FROM audit_criteria").fetchone()[0] == 2
+
+
+def test_jd_hash_ignores_whitespace():
+    assert store.jd_hash("1. 年龄30岁以下\n2. 本科") == store.jd_hash("  1.年龄30岁以下 2.本科\t")
+    assert store.jd_hash("本科") != store.jd_hash("硕士")
+
+
+def test_save_audit_coerces_loose_criterion_values(db_path):
+    result = make_result(criteria=[{
+        "name": None,
+        "match": "Unknown",
+        "job_requirement": ["计算机类", "电子信息类"],
+        "candidate_evidence": {"major": "软件工程"},
+        "rationale": 1
+    }])
+
+    audit_id, _ = store.save_audit({"name": ["张三"]}, "jd", "摘要", result, db_path=db_path)
+
+    row = sqlite3.connect(db_path).execute(
+        "SELECT name, job_requirement, candidate_evidence, rationale FROM audit_criteria WHERE audit_id = ?",
+        (audit_id,)
+    ).fetchone()
+    assert row == ("", '["计算机类", "电子信息类"]', '{"major": "软件工程"}', "1")
+
+
+def test_loose_missing_data_and_policy_flags_are_listed(db_path):
+    store.save_audit({"name": "张三"}, "jd", "s", make_result(missing_data=1, policy_flags="潜在合规风险：年龄"),
+                     db_path=db_path)
+
+    item = store.query_audits({}, db_path=db_path)["items"][0]
+    assert item["missing_data"] == [1]
+    assert item["policy_flags"] == ["潜在合规风险：年龄"]
+
+    rows = list(store.iter_export_rows({}, db_path=db_path))
+    assert rows[0][6:8] == ["1", "潜在合规风险：年龄"]
+
+
+def test_export_formats_rows_saved_without_list_normalization(db_path):
+    # Rows written before save_audit normalized these fields
+    store.save_audit({"name": "张三"}, "jd", "s", make_result(), db_path=db_path)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("""UPDATE audits SET missing_data = '1', policy_flags = '"潜在合规风险：年龄"'""")
+
+    rows = list(store.iter_export_rows({}, db_path=db_path))
+    assert rows[0][6:8] == ["1", "潜在合规风险：年龄"]
+
+
+def test_query_audits_filters(db_path):
+    store.save_audit({"name": "张三"}, "JD-A", "s", make_result(), db_path=db_path)
+    store.save_audit({"name": "李四"}, "JD-A", "s", make_result(verdict="通过", major_match="Yes"), db_path=db_path)
+    store.save_audit({"name": "王五"}, "JD-B", "s", make_result(), db_path=db_path)
+
+    def names(**filters):
+        page = store.query_audits(filters, db_path=db_path)
+        return [item["candidate_name"] for item in page["items"]]
+
+    assert names(jd_hash=store.jd_hash("JD-A")) == ["李四", "张三"]
+    assert names(verdict="未通过") == ["王五", "张三"]
+    assert names(jd_hash=store.jd_hash("JD-A"), verdict="未通过", criterion="专业", criterion_match="No") == ["张三"]
+    assert names(criterion="专业", criterion_match="Yes") == ["李四"]
+    # criterion_match alone matches any criterion with that result
+    assert names(criterion_match="No") == ["王五", "张三"]
+    assert names(criterion="学历") == []
+
+
+def test_jd_verdict_criterion_query_uses_composite_index(db_path):
+    where, params = store._build_filters({
+        "jd_hash": store.jd_hash("JD-A"), "verdict": "未通过", "criterion": "专业", "criterion_match": "No"
+    })
+    conn = store.connect(db_path)
+    plan = [row["detail"] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT a.* FROM audits a{where} ORDER BY a.id DESC LIMIT ?", params + [51]
+    )]
+
+    assert any("idx_audits_jd_verdict" in detail for detail in plan)
+    assert any("idx_criteria_name" in detail for detail in plan)
+    assert not any("TEMP B-TREE" in detail for detail in plan)
+
+
+def test_query_audits_keyset_pagination(db_path):
+    for i in range(5):
+        store.save_audit({"name": f"候选人{i}"}, "jd", "s", make_result(), db_path=db_path)
+
+    seen = []
+    cursor = None
+    while True:
+        page = store.query_audits({}, limit=2, cursor=cursor, include_result=False, db_path=db_path)
+        seen.extend(item["id"] for item in page["items"])
+        assert all("result" not in item for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [5, 4, 3, 2, 1]
+
+
+def test_normalize_timestamp():
+    assert store.normalize_timestamp("2025-01-01") == "2025-01-01T00:00:00"
+    with pytest.raises(ValueError):
+        store.normalize_timestamp("yesterday")
+
+
+def test_export_cell_strips_control_characters_only():
+    assert store.export_cell("s\x0bummary") == "summary"
+    assert store.export_cell("\x01=1") == "=1"
+    assert store.export_cell("-张三") == "-张三"
+    assert store.export_cell(42) == 42
+    assert store.export_cell(None) is None
+
+
+def test_escape_formula():
+    assert store.escape_formula('=HYPERLINK("http://evil","x")') == '\'=HYPERLINK("http://evil","x")'
+    for prefix in ("+", "-", "@", "\t", "\r"):
+        assert store.escape_formula(prefix + "1") == "'" + prefix + "1"
+    assert store.escape_formula("张三") == "张三"
+    assert store.escape_formula(-1) == -1
+
+
+def test_iter_export_rows_reads_in_batches(db_path, monkeypatch):
+    for i in range(5):
+        store.save_audit({"name": f"候选人{i}"}, "jd", "s", make_result(), db_path=db_path)
+
+    connections = []
+    real_connect = store.connect
+
+    def counting_connect(path=None):
+        conn = real_connect(path)
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(store, "connect", counting_connect)
+    rows = store.iter_export_rows({"verdict": "未通过"}, db_path=db_path, batch_size=2)
+
+    first = next(rows)
+    assert first[0] == 5
+    # Between batches no connection (and so no read snapshot) is left open
+    assert len(connections) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+
+    assert [first[0]] + [row[0] for row in rows] == [5, 4, 3, 2, 1]
+    assert len(connections) == 3
+
+
+def test_iter_export_rows_skips_corrupt_rows(db_path):
+    store.save_audit({"name": "张三"}, "jd", "s", make_result(), db_path=db_path)
+    store.save_audit({"name": "李四"}, "jd", "s", make_result(), db_path=db_path)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE audits SET result_json = 'not json' WHERE id = 2")
+
+    rows = list(store.iter_export_rows({}, db_path=db_path))
+
+    assert len(rows) == 1
+    assert rows[0][2] == "张三"
+    assert rows[0][5] == "年龄:Yes; 专业:No"
+
+
+def test_audit_persists_and_survives_store_failure(client, monkeypatch):
+    monkeypatch.setattr(app_module, "evaluate", lambda candidate, jd: ("结论：未通过", make_result()))
+    payload = {"candidate": {"name": "张三"}, "job_requirements": "专业：计算机"}
+
+    metadata = client.post("/audit", json=payload).get_json()["metadata"]
+    assert metadata["audit_id"] == 1
+    assert metadata["jd_hash"] == store.jd_hash("专业：计算机")
+
+    def broken_save(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "save_audit", broken_save)
+    response = client.post("/audit", json=payload)
+    assert response.status_code == 200
+    assert response.get_json()["metadata"]["audit_id"] is None
+    assert response.get_json()["data"]["result"]["verdict"] == "未通过"
+
+
+def test_list_audits_endpoint(client, db_path):
+    for i in range(3):
+        store.save_audit({"name": f"候选人{i}"}, "专业：计算机", "s", make_result(), db_path=db_path)
+
+    first = client.get("/audits", query_string={"limit": 2}).get_json()
+    assert first["success"] is True
+    assert [item["id"] for item in first["data"]] == [3, 2]
+    second = client.get("/audits", query_string={"limit": 2, "cursor": first["next_cursor"]}).get_json()
+    assert [item["id"] for item in second["data"]] == [1]
+    assert second["next_cursor"] is None
+
+    # job_requirements is hashed the same way as at save time
+    by_text = client.get("/audits", query_string={"job_requirements": "专业： 计算机"}).get_json()
+    assert len(by_text["data"]) == 3
+
+
+@pytest.mark.parametrize("query", [
+    {"limit": "abc"},
+    {"limit": 0},
+    {"limit": 501},
+    {"cursor": "abc"},
+    {"since": "yesterday"},
+    {"until": "2025-13-01"},
+])
+def test_list_audits_rejects_bad_parameters(client, query):
+    response = client.get("/audits", query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_export_csv(client, db_path):
+    store.save_audit({"name": '=HYPERLINK("http://evil","x")'}, "jd", "s", make_result(), db_path=db_path)
+
+    response = client.get("/audits/export")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.reader(io.StringIO(response.data.decode("utf-8-sig"))))
+    assert rows[0] == store.EXPORT_COLUMNS
+    assert rows[1][2] == '\'=HYPERLINK("http://evil","x")'
+
+
+def test_export_xlsx(client, db_path):
+    store.save_audit({"name": "=1+1"}, "jd", "s\x0bummary", make_result(missing_data=["-张三"]), db_path=db_path)
+
+    response = client.get("/audits/export", query_string={"format": "xlsx"})
+
+    assert response.status_code == 200
+    ws = load_workbook(io.BytesIO(response.data)).active
+    rows = list(ws.iter_rows(values_only=True))
+    assert list(rows[0]) == store.EXPORT_COLUMNS
+    name_cell = ws.cell(row=2, column=3)
+    assert name_cell.value == "=1+1"
+    assert name_cell.data_type == "s"
+    assert ws.cell(row=2, column=7).value == "-张三"
+    assert ws.cell(row=2, column=9).value == "summary"
+
+
+def test_export_rejects_bad_parameters(client):
+    assert client.get("/audits/export", query_string={"format": "pdf"}).status_code == 400
+    assert client.get("/audits/export", query_string={"since": "bad"}).status_code == 400